@@ -1,14 +1,133 @@
-from flask import Flask, request, jsonify
+import functools
+import os
+
+import msgspec
+import orjson
+from flask import Blueprint, Flask, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, delete, event, insert, select, text, update
+from sqlalchemy.engine import Engine
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider that serializes with orjson instead of the stdlib json module.
+
+    Non-string keys are converted to strings and dates are passed to Flask's
+    default handling, so output matches the stdlib provider. Keyword
+    arguments orjson has no equivalent for raise a TypeError.
+    """
+
+    def encode(self, obj, default=None, indent=None, sort_keys=False, separators=None, **kwargs):
+        """
+        Serializes an object to JSON bytes, mapping json.dumps arguments to orjson options.
+
+        Parameters:
+            obj: The object to serialize.
+            default (function): Fallback for values orjson cannot encode.
+            indent (int): Either None or 2, the only indent orjson supports.
+            sort_keys (bool): Whether to sort object keys.
+            separators (tuple): Either None or one of the standard separator pairs.
+
+        Returns:
+            bytes: The encoded JSON.
+        """
+        if kwargs:
+            raise TypeError(f"Unsupported JSON arguments: {', '.join(kwargs)}")
+        if indent not in (None, 0, 2):
+            raise TypeError('Only indent=2 is supported')
+        if separators not in (None, (',', ':'), (',', ': '), (', ', ': ')):
+            raise TypeError('Only the standard JSON separators are supported')
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default or self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        return self.encode(obj, **kwargs).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            raise TypeError(f"Unsupported JSON arguments: {', '.join(kwargs)}")
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError('app.json.response() takes either args or kwargs, not both')
+        if len(args) == 1:
+            obj = args[0]
+        else:
+            obj = args or kwargs or None
+        # Pretty-print in debug mode unless compact output was requested, as Flask does
+        indent = 2 if self.compact is False or (self.compact is None and self._app.debug) else None
+        return self._app.response_class(
+            self.encode(obj, indent=indent, sort_keys=self.sort_keys), mimetype=self.mimetype
+        )
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
+# Compress JSON bodies large enough to benefit, such as the notes list.
+# Streamed responses have no Content-Length, so the minimum size does not
+# apply to them and the streamed notes list is always compressed.
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_MIN_SIZE'] = 512
+# Flask-Compress leaves gzip out of streaming by default; keep it so
+# gzip-only clients still get a compressed notes list
+app.config['COMPRESS_ALGORITHM_STREAMING'] = ['zstd', 'br', 'gzip', 'deflate']
+Compress(app)
+
+# Request threads per process when served by Waitress; the reader pool is
+# sized to match since each thread holds at most one reader connection
+SERVER_THREADS = 8
+
 # Configure the SQLite database
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///notes.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+engine_options = {
+    'connect_args': {'check_same_thread': False, 'timeout': 30},
+    'pool_pre_ping': True,
+}
+# SQLite allows a single writer, so writes share one connection while reads
+# go through a separate pool and never queue behind them
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options, 'pool_size': 1, 'max_overflow': 0}
+app.config['SQLALCHEMY_BINDS'] = {
+    'reader': {**engine_options, 'url': app.config['SQLALCHEMY_DATABASE_URI'], 'pool_size': SERVER_THREADS},
+}
+# No handler loads ORM instances today; this only keeps any future
+# post-commit attribute access from issuing a refresh SELECT
+db = SQLAlchemy(app, session_options={'expire_on_commit': False})
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    """
+    Tunes every new SQLite connection for write throughput.
+
+    Switches the journal to WAL so commits become sequential appends, and
+    relaxes synchronous to NORMAL so each commit costs a single fsync.
+    A 256 MiB memory map serves reads straight from the OS page cache,
+    shared by every connection and process, so the private per-connection
+    page cache is kept small (8 MiB) and mostly holds pages being written.
+    Does nothing when the app is configured for a non-SQLite database.
+
+    Parameters:
+        dbapi_connection: The raw DB-API connection that was just opened.
+        connection_record: The pool record owning the connection.
+    """
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite:'):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-8192')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.close()
 
 # Define the Note model
 class Note(db.Model):
@@ -16,243 +135,312 @@ class Note(db.Model):
     title = db.Column(db.String(120), nullable=False)
     content = db.Column(db.Text, nullable=False)
 
+# Statements are built once at import so handlers only bind parameters and
+# always hit the compiled statement cache
+insert_note_stmt = insert(Note).returning(Note.id)
+select_note_stmt = select(Note.title, Note.content).where(Note.id == bindparam('note_id'))
+select_notes_stmt = select(Note.id, Note.title, Note.content).execution_options(yield_per=1000)
+update_note_stmt = (
+    update(Note)
+    .where(Note.id == bindparam('note_id'))
+    .values(title=bindparam('new_title'), content=bindparam('new_content'))
+)
+delete_note_stmt = delete(Note).where(Note.id == bindparam('note_id'))
+bulk_insert_sql = f'INSERT INTO {Note.__tablename__} (title, content) VALUES (?, ?)'
+
+def reader_bind():
+    """
+    Returns bind arguments that route a query to the read-only pool.
+
+    Returns:
+        dict: Keyword arguments for the session's bind_arguments parameter.
+    """
+    return {'bind': db.engines['reader']}
+
+class NoteIn(msgspec.Struct):
+    """
+    Request body for creating or updating a note.
+    """
+    title: str
+    content: str
+
+# Decoders are built once so each request is parsed and validated in one pass
+note_decoder = msgspec.json.Decoder(NoteIn)
+notes_decoder = msgspec.json.Decoder(list[NoteIn])
+
+# Full-text index over note titles and content. It reads rows from the note
+# table itself and is kept in sync by triggers, so every write path
+# (including the raw bulk insert) updates it.
+search_index_ddl = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5("
+    "title, content, content='note', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN "
+    "INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN "
+    "INSERT INTO note_fts(note_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE ON note BEGIN "
+    "INSERT INTO note_fts(note_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+)
+rebuild_search_index_stmt = text("INSERT INTO note_fts(note_fts) VALUES ('rebuild')")
+search_notes_stmt = text(
+    'SELECT note.id, note.title, note.content FROM note_fts '
+    'JOIN note ON note.id = note_fts.rowid '
+    'WHERE note_fts MATCH :query ORDER BY note_fts.rank LIMIT :limit'
+)
+SEARCH_LIMIT_DEFAULT = 20
+SEARCH_LIMIT_MAX = 100
+
+# Single-row counter bumped by triggers on every write to the note table.
+# It lives in the database so all workers agree on it, which lets
+# list_notes tag its response without building the body first. The random
+# token is drawn when the row is first created, so a recreated database
+# never reuses an old tag even though its counter restarts at 0.
+change_counter_ddl = (
+    "CREATE TABLE IF NOT EXISTS note_version ("
+    "id INTEGER PRIMARY KEY CHECK (id = 1), token TEXT NOT NULL, version INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO note_version (id, token, version) "
+    "VALUES (1, lower(hex(randomblob(8))), 0)",
+    "CREATE TRIGGER IF NOT EXISTS note_version_ai AFTER INSERT ON note BEGIN "
+    "UPDATE note_version SET version = version + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS note_version_au AFTER UPDATE ON note BEGIN "
+    "UPDATE note_version SET version = version + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS note_version_ad AFTER DELETE ON note BEGIN "
+    "UPDATE note_version SET version = version + 1; END",
+)
+select_notes_version_stmt = text('SELECT token, version FROM note_version')
+
+def create_change_counter(conn):
+    """
+    Creates the note change counter and its triggers if missing.
+
+    Every statement is idempotent, so a partly created counter is completed.
+
+    Parameters:
+        conn: A connection holding SQLite's write lock.
+    """
+    for statement in change_counter_ddl:
+        conn.execute(text(statement))
+
+def create_search_index(conn):
+    """
+    Creates the full-text search index and its sync triggers if missing.
+
+    Existing notes are indexed when the index is first created.
+
+    Parameters:
+        conn: A connection holding SQLite's write lock.
+    """
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_fts'")
+    ).first()
+    for statement in search_index_ddl:
+        conn.execute(text(statement))
+    if exists is None:
+        conn.execute(rebuild_search_index_stmt)
+
+def create_schema():
+    """
+    Creates the tables, the change counter and the search index if missing.
+
+    The app requires SQLite: the change counter and FTS5 index are SQLite
+    features that the GET routes depend on. Everything runs in one
+    BEGIN IMMEDIATE transaction, so workers starting together against a
+    fresh database wait on the write lock and apply the schema exactly once.
+    """
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+        db.metadata.create_all(conn)
+        create_change_counter(conn)
+        create_search_index(conn)
+
 # Create tables
 with app.app_context():
-    db.create_all()
+    create_schema()
+
+notes_bp = Blueprint('notes', __name__, url_prefix='/api/notes')
+
+@functools.lru_cache(maxsize=1)
+def load_openapi_spec():
+    """
+    Loads the OpenAPI document describing the notes API.
+
+    The YAML is only read and parsed on first use, keeping it out of the
+    import path for cold starts.
+
+    Returns:
+        dict: The parsed OpenAPI document.
+    """
+    import yaml
 
-@app.route('/api/notes', methods=['POST'])
+    with open(os.path.join(os.path.dirname(__file__), 'openapi.yaml')) as f:
+        return yaml.safe_load(f)
+
+@app.route('/api/openapi.json', methods=['GET'])
+def openapi_spec():
+    """
+    Serves the OpenAPI document for the notes API.
+    """
+    return jsonify(load_openapi_spec())
+
+@notes_bp.route('', methods=['POST'])
 def add_note():
     """
     Creates a new note.
-    ---
-    post:
-      summary: Creates a new note.
-      description: Creates a new note with the given title and content.
-      requestBody:
-        description: The note to add.
-        content:
-          application/json:
-            schema:
-              type: object
-              required:
-                - title
-                - content
-              properties:
-                title:
-                  type: string
-                  description: The title of the note.
-                content:
-                  type: string
-                  description: The content of the note.
-      responses:
-        201:
-          description: The note has been created.
-          content:
-            application/json:
-              schema:
-                type: object
-                properties:
-                  id:
-                    type: integer
-                    description: The ID of the note.
-                  title:
-                    type: string
-                    description: The title of the note.
-                  content:
-                    type: string
-                    description: The content of the note.
-        400:
-          description: A note without title and content was provided.
-    """
-    data = request.get_json()
-    if not data or 'title' not in data or 'content' not in data:
+    """
+    try:
+        data = note_decoder.decode(request.get_data())
+    except msgspec.DecodeError:
         return jsonify({'error': 'Title and content required'}), 400
-    note = Note(title=data['title'], content=data['content'])
-    db.session.add(note)
+    note_id = db.session.scalars(insert_note_stmt, [{'title': data.title, 'content': data.content}]).one()
     db.session.commit()
-    return jsonify({'id': note.id, 'title': note.title, 'content': note.content}), 201
+    return jsonify({'id': note_id, 'title': data.title, 'content': data.content}), 201
+
+@notes_bp.route('/bulk', methods=['POST'])
+def add_notes_bulk():
+    """
+    Creates several notes in a single transaction.
+    """
+    try:
+        data = notes_decoder.decode(request.get_data())
+    except msgspec.DecodeError:
+        return jsonify({'error': 'A list of notes with title and content required'}), 400
+    rows = [(d.title, d.content) for d in data]
+    if not rows:
+        return jsonify([]), 201
+    # Bypass the ORM and hand the whole batch to the driver's executemany;
+    # the write transaction holds SQLite's lock, so the new rowids are the
+    # contiguous run ending at last_insert_rowid()
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.executemany(bulk_insert_sql, rows)
+        last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+    finally:
+        cursor.close()
+    db.session.commit()
+    first_id = last_id - len(rows) + 1
+    result = [
+        {'id': first_id + i, 'title': title, 'content': content}
+        for i, (title, content) in enumerate(rows)
+    ]
+    return jsonify(result), 201
+
+def generate_notes_json(rows):
+    """
+    Encodes note rows as a JSON array one fetched batch at a time.
+
+    Each yield_per partition of the result becomes a single chunk, so the
+    server writes one block per batch rather than one per row.
+
+    The 200 status and headers are sent before the first row is read, so an
+    error partway through (for example a database failure) cannot be turned
+    into an error response: the client receives a truncated JSON array and
+    the connection is closed. Clients must treat a body that fails to parse
+    as a failed request.
 
-@app.route('/api/notes', methods=['GET'])
+    Parameters:
+        rows: A result of rows with id, title and content attributes.
+
+    Yields:
+        bytes: Consecutive chunks of the JSON array.
+    """
+    yield b'['
+    separator = b''
+    for batch in rows.partitions():
+        notes = [{'id': r.id, 'title': r.title, 'content': r.content} for r in batch]
+        # Strip the brackets so batches join into one array
+        yield separator + app.json.encode(notes, sort_keys=app.json.sort_keys)[1:-1]
+        separator = b','
+    yield b']'
+
+@notes_bp.route('', methods=['GET'])
 def list_notes():
     """
     Lists all notes.
-    ---
-    get:
-      summary: Lists all notes.
-      description: Lists all notes.
-      responses:
-        200:
-          description: A list of notes.
-          content:
-            application/json:
-              schema:
-                type: array
-                items:
-                  type: object
-                  properties:
-                    id:
-                      type: integer
-                      description: The ID of the note.
-                    title:
-                      type: string
-                      description: The title of the note.
-                    content:
-                      type: string
-                      description: The content of the note.
-    """
-    notes = Note.query.all()
-    result = [{'id': n.id, 'title': n.title, 'content': n.content} for n in notes]
-    return jsonify(result)
-
-@app.route('/api/notes/<int:note_id>', methods=['GET'])
+    """
+    # Read the version before the rows: if a write lands in between, the
+    # response carries an older tag and the client's next request misses
+    token, version = db.session.execute(
+        select_notes_version_stmt, bind_arguments=reader_bind()
+    ).one()
+    etag = f'{token}-{version}'
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        rows = db.session.execute(select_notes_stmt, bind_arguments=reader_bind())
+        response = app.response_class(
+            stream_with_context(generate_notes_json(rows)), mimetype='application/json'
+        )
+    response.set_etag(etag, weak=True)
+    return response
+
+@notes_bp.route('/search', methods=['GET'])
+def search_notes():
+    """
+    Searches notes by title and content.
+    """
+    terms = request.args.get('q', '').split()
+    if not terms:
+        return jsonify({'error': 'Search query required'}), 400
+    limit = request.args.get('limit', str(SEARCH_LIMIT_DEFAULT))
+    if not limit.isdigit() or not 1 <= int(limit) <= SEARCH_LIMIT_MAX:
+        return jsonify({'error': f'Limit must be between 1 and {SEARCH_LIMIT_MAX}'}), 400
+    # Quote every term so user input is matched literally, not as FTS5 syntax
+    query = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    rows = db.session.execute(
+        search_notes_stmt, {'query': query, 'limit': int(limit)}, bind_arguments=reader_bind()
+    ).all()
+    return jsonify([{'id': r.id, 'title': r.title, 'content': r.content} for r in rows])
+
+@notes_bp.route('/<int:note_id>', methods=['GET'])
 def get_note(note_id):
     """
     Gets a note by its ID.
-    ---
-    get:
-      summary: Gets a note by its ID.
-      description: Gets a note by its ID.
-      parameters:
-        - in: path
-          name: note_id
-          required: true
-          schema:
-            type: integer
-          description: The ID of the note to get.
-      responses:
-        200:
-          description: The note.
-          content:
-            application/json:
-              schema:
-                type: object
-                properties:
-                  id:
-                    type: integer
-                    description: The ID of the note.
-                  title:
-                    type: string
-                    description: The title of the note.
-                  content:
-                    type: string
-                    description: The content of the note.
-        404:
-          description: Note not found.
-          content:
-            application/json:
-              schema:
-                type: object
-                properties:
-                  error:
-                    type: string
-                    description: The error message.
-    """
-    note = Note.query.get(note_id)
-    if note is None:
+    """
+    row = db.session.execute(
+        select_note_stmt, {'note_id': note_id}, bind_arguments=reader_bind()
+    ).first()
+    if row is None:
         return jsonify({'error': 'Note not found'}), 404
-    return jsonify({'id': note.id, 'title': note.title, 'content': note.content})
+    response = jsonify({'id': note_id, 'title': row.title, 'content': row.content})
+    response.add_etag(weak=True)
+    return response.make_conditional(request)
 
-@app.route('/api/notes/<int:note_id>', methods=['PUT'])
+@notes_bp.route('/<int:note_id>', methods=['PUT'])
 def update_note(note_id):
     """
     Updates a note by its ID.
-    ---
-    put:
-      summary: Updates a note by its ID.
-      description: Updates a note by its ID.
-      parameters:
-        - in: path
-          name: note_id
-          required: true
-          schema:
-            type: integer
-          description: The ID of the note to update.
-      requestBody:
-        description: The note to update.
-        content:
-          application/json:
-            schema:
-              type: object
-              required:
-                - title
-                - content
-              properties:
-                title:
-                  type: string
-                  description: The title of the note.
-                content:
-                  type: string
-                  description: The content of the note.
-      responses:
-        200:
-          description: The note has been updated.
-          content:
-            application/json:
-              schema:
-                type: object
-                properties:
-                  result:
-                    type: string
-                    description: The result of the update.
-        400:
-          description: A note without title and content was provided.
-        404:
-          description: Note not found.
-    """
-    note = Note.query.get(note_id)
-    if note is None:
-        return jsonify({'error': 'Note not found'}), 404
-    data = request.get_json()
-    if not data or 'title' not in data or 'content' not in data:
+    """
+    try:
+        data = note_decoder.decode(request.get_data())
+    except msgspec.DecodeError:
         return jsonify({'error': 'Title and content required'}), 400
-    note.title = data['title']
-    note.content = data['content']
+    result = db.session.execute(
+        update_note_stmt,
+        {'note_id': note_id, 'new_title': data.title, 'new_content': data.content},
+    )
     db.session.commit()
+    if result.rowcount == 0:
+        return jsonify({'error': 'Note not found'}), 404
     return jsonify({'result': 'Updated'})
 
-@app.route('/api/notes/<int:note_id>', methods=['DELETE'])
+@notes_bp.route('/<int:note_id>', methods=['DELETE'])
 def delete_note(note_id):
     """
     Deletes a note by its ID.
-    ---
-    delete:
-      summary: Deletes a note by its ID.
-      description: Deletes a note by its ID.
-      parameters:
-        - in: path
-          name: note_id
-          required: true
-          schema:
-            type: integer
-          description: The ID of the note to delete.
-      responses:
-        200:
-          description: The note has been deleted.
-          content:
-            application/json:
-              schema:
-                type: object
-                properties:
-                  result:
-                    type: string
-                    description: The result of the deletion.
-        404:
-          description: Note not found.
-          content:
-            application/json:
-              schema:
-                type: object
-                properties:
-                  error:
-                    type: string
-                    description: The error message.
-    """
-    note = Note.query.get(note_id)
-    if note:
-        db.session.delete(note)
-        db.session.commit()
-        return jsonify({'result': 'Deleted'})
-    return jsonify({'error': 'Note not found'}), 404
+    """
+    result = db.session.execute(delete_note_stmt, {'note_id': note_id})
+    db.session.commit()
+    if result.rowcount == 0:
+        return jsonify({'error': 'Note not found'}), 404
+    return jsonify({'result': 'Deleted'})
+
+app.register_blueprint(notes_bp)
 
 def handler(environ, start_response):
     """
@@ -269,4 +457,13 @@ def handler(environ, start_response):
     """
     return app(environ, start_response)
 
-
+if __name__ == '__main__':
+    # Listen on localhost only unless a host is given, since the API has no
+    # authentication and allows requests from any origin
+    host = os.environ.get('FLASK_RUN_HOST', '127.0.0.1')
+    # app.debug follows FLASK_DEBUG
+    if app.debug:
+        app.run(host=host, port=5328)
+    else:
+        from waitress import serve
+        serve(app, host=host, port=5328, threads=SERVER_THREADS)